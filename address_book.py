@@ -1,152 +1,434 @@
 from __future__ import annotations
 
-from collections import UserDict
-from typing import Optional, List
-from datetime import datetime, date, timedelta
+from collections.abc import Mapping, MutableMapping
+from typing import Optional, List, Dict, Tuple, Iterable
+from datetime import datetime, date
 from functools import wraps
+from itertools import groupby
+from operator import itemgetter
+from calendar import isleap
+from contextlib import suppress
+import json
+import os
 import pickle
+import shutil
+import sys
+
+
+# Days to move a congratulation forward, indexed by weekday(): Saturday and
+# Sunday roll over to the following Monday.
+_WEEKEND_SHIFT = (0, 0, 0, 0, 0, 2, 1)
 
 
 class Field:
+    __slots__ = ("value",)
+
     def __init__(self, value: str):
         self.value = value
 
     def __str__(self) -> str:
         return str(self.value)
 
-    @property
-    def value(self) -> str:
-        return self._value
+    def __getstate__(self) -> dict:
+        return {"value": self.value}
 
-    @value.setter
-    def value(self, new_value: str) -> None:
-        self._value = new_value
+    def __setstate__(self, state: dict) -> None:
+        # Pickles written before Field used __slots__ store the value as "_value".
+        self.value = state["value"] if "value" in state else state["_value"]
 
 
 class Name(Field):
-    pass
+    __slots__ = ()
+
+
+def _normalize_phone(value: str) -> str:
+    if not isinstance(value, str):
+        value = str(value)
+    if value[:1].isspace() or value[-1:].isspace():
+        value = value.strip()
+    # isdigit() alone also accepts non-ASCII digits such as "\u0660".
+    if len(value) != 10 or not (value.isascii() and value.isdigit()):
+        raise ValueError("Phone number must be 10 digits.")
+    return value
 
 
 class Phone(Field):
-    @Field.value.setter
-    def value(self, new_value: str) -> None:
-        normalized = str(new_value).strip()
-        if not (normalized.isdigit() and len(normalized) == 10):
-            raise ValueError("Phone number must be 10 digits.")
-        self._value = normalized
+    __slots__ = ()
+
+    def __init__(self, value: str):
+        self.value = _normalize_phone(value)
 
 
 class Birthday(Field):
-    @Field.value.setter
-    def value(self, new_value: str) -> None:
-        raw = str(new_value).strip()
+    __slots__ = ("display_dmy",)
+
+    def __init__(self, value: str):
+        raw = str(value).strip()
         try:
             parsed = datetime.strptime(raw, "%d.%m.%Y").date()
         except ValueError:
             raise ValueError("Invalid date format. Use DD.MM.YYYY")
-        self._value = parsed
+        self._set_parsed(parsed)
+
+    def _set_parsed(self, parsed: date) -> None:
+        self.value = parsed
+        self.display_dmy = parsed.strftime("%d.%m.%Y")
+
+    def __setstate__(self, state: dict) -> None:
+        super().__setstate__(state)
+        self._set_parsed(self.value)
 
 
 class Record:
+    __slots__ = ("name", "_phones", "_birthday", "_phone_index", "_phones_str_cache")
+
+    # Bumped whenever any record's birthday is set. Address books compare it
+    # with the value their birthday index was built at and rebuild on change,
+    # so a record can sit in any number of books without knowing about them.
+    _birthday_changes = 0
+
     def __init__(self, name: str):
         self.name: Name = Name(name)
-        self.phones: List[Phone] = []
-        self.birthday: Optional[Birthday] = None
+        self._phones: Tuple[Phone, ...] = ()
+        self._birthday: Optional[Birthday] = None
+        self._phone_index: Dict[str, Phone] = {}
+        self._phones_str_cache: Optional[str] = None
+
+    @property
+    def phones(self) -> Tuple[Phone, ...]:
+        # Read-only: phones change only through add_phone(s), remove_phone
+        # and edit_phone, which keep _phone_index and the display cache in
+        # step with them.
+        return self._phones
+
+    @property
+    def birthday(self) -> Optional[Birthday]:
+        return self._birthday
+
+    @birthday.setter
+    def birthday(self, birthday: Optional[Birthday]) -> None:
+        self._birthday = birthday
+        Record._birthday_changes += 1
 
     def add_phone(self, phone: str) -> Phone:
         phone_obj = Phone(phone)
-        self.phones.append(phone_obj)
+        existing = self._phone_index.get(phone_obj.value)
+        if existing is not None:
+            return existing
+        self._phones += (phone_obj,)
+        self._phone_index[phone_obj.value] = phone_obj
+        self._phones_str_cache = None
         return phone_obj
 
+    def add_phones(self, phones: Iterable[str]) -> None:
+        # Validate everything first so a bad number leaves the record untouched.
+        normalized = [_normalize_phone(phone) for phone in phones]
+        index = self._phone_index
+        added: List[Phone] = []
+        for value in normalized:
+            if value in index:
+                continue
+            phone_obj = Phone.__new__(Phone)
+            phone_obj.value = value
+            added.append(phone_obj)
+            index[value] = phone_obj
+        self._phones += tuple(added)
+        self._phones_str_cache = None
+
     def remove_phone(self, phone: str) -> bool:
-        phone_obj = self.find_phone(phone)
+        phone_obj = self._phone_index.pop(phone, None)
         if phone_obj is None:
             return False
-        self.phones.remove(phone_obj)
+        self._phones = tuple(p for p in self._phones if p is not phone_obj)
+        self._phones_str_cache = None
         return True
 
     def edit_phone(self, old_phone: str, new_phone: str) -> bool:
         phone_obj = self.find_phone(old_phone)
         if phone_obj is None:
             return False
-        phone_obj.value = new_phone
+        new_obj = Phone(new_phone)
+        del self._phone_index[old_phone]
+        if new_obj.value in self._phone_index:
+            self._phones = tuple(p for p in self._phones if p is not phone_obj)
+        else:
+            self._phones = tuple(new_obj if p is phone_obj else p for p in self._phones)
+            self._phone_index[new_obj.value] = new_obj
+        self._phones_str_cache = None
         return True
 
     def find_phone(self, phone: str) -> Optional[Phone]:
-        for p in self.phones:
-            if p.value == phone:
-                return p
-        return None
+        return self._phone_index.get(phone)
+
+    def phones_str(self) -> str:
+        if self._phones_str_cache is None:
+            self._phones_str_cache = "; ".join(p.value for p in self._phones)
+        return self._phones_str_cache
 
     def add_birthday(self, birthday: str) -> Birthday:
         self.birthday = Birthday(birthday)
         return self.birthday
 
+    def __getstate__(self) -> dict:
+        return {
+            "name": self.name,
+            "phones": list(self._phones),
+            "birthday": self._birthday,
+            "_phone_index": self._phone_index,
+        }
+
+    def __setstate__(self, state: dict) -> None:
+        # Older pickles carry the instance __dict__ and may predate the
+        # phone index; a stored "_book" back-reference is ignored.
+        self.name = state["name"]
+        self._phones = tuple(state["phones"])
+        self._birthday = state["birthday"]
+        self._phone_index = state.get("_phone_index")
+        if self._phone_index is None:
+            self._phone_index = {p.value: p for p in self._phones}
+        self._phones_str_cache = None
+
     def __str__(self) -> str:
         return (
-            f"Contact name: {self.name.value}, phones: {'; '.join(p.value for p in self.phones)}"
+            f"Contact name: {self.name.value}, phones: {self.phones_str()}"
         )
 
 
-class AddressBook(UserDict):
+def _plain_date(d: date) -> str:
+    # strftime("%Y") does not zero-pad years below 1000 on every platform,
+    # which would not parse back through Birthday.
+    return f"{d.day:02d}.{d.month:02d}.{d.year:04d}"
+
+
+class AddressBook(MutableMapping):
+    # Records live in a private dict. find(), get(), membership and
+    # iteration go straight to it; every write goes through __setitem__ or
+    # __delitem__, which keep the birthday index in sync.
+    def __init__(self, *args, **kwargs):
+        self._records: Dict[str, Record] = {}
+        self._by_md: Optional[Dict[Tuple[int, int], List[Record]]] = None
+        self._by_md_changes = 0
+        self.update(*args, **kwargs)
+
+    def __getitem__(self, name: str) -> Record:
+        return self._records[name]
+
+    def __setitem__(self, name: str, record: Record) -> None:
+        old = self._records.get(name)
+        if old is not None:
+            self._unindex_birthday(old)
+        self._records[name] = record
+        self._index_birthday(record)
+
+    def __delitem__(self, name: str) -> None:
+        record = self._records.pop(name)
+        self._unindex_birthday(record)
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._records
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self._records!r})"
+
+    def get(self, name: str, default=None):
+        return self._records.get(name, default)
+
+    def values(self):
+        return self._records.values()
+
+    def items(self):
+        return self._records.items()
+
+    def clear(self) -> None:
+        self._records.clear()
+        self._by_md = None
+
+    def copy(self) -> AddressBook:
+        new = type(self)()
+        new._records.update(self._records)
+        return new
+
+    __copy__ = copy
+
+    @classmethod
+    def fromkeys(cls, names: Iterable[str], record: Optional[Record] = None) -> AddressBook:
+        book = cls()
+        for name in names:
+            book[name] = record
+        return book
+
+    def __or__(self, other):
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        new = self.copy()
+        new.update(other)
+        return new
+
+    def __ror__(self, other):
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        new = type(self)(other)
+        new.update(self)
+        return new
+
+    def __ior__(self, other) -> AddressBook:
+        self.update(other)
+        return self
+
+    def __getstate__(self) -> dict:
+        return {"data": self._records}
+
+    def __setstate__(self, state: dict) -> None:
+        # Same {"data": {...}} layout as the UserDict-based AddressBook, so
+        # those pickles load here too. The birthday index is derived data
+        # and is rebuilt on first use.
+        self._records = {}
+        self._by_md = None
+        self._by_md_changes = 0
+        for name, record in state.get("data", {}).items():
+            self[name] = record
+
+    def _live_index(self) -> Optional[Dict[Tuple[int, int], List[Record]]]:
+        # The index is dropped once any record's birthday has changed since it
+        # was built; _birthday_index() rebuilds it on the next lookup.
+        if self._by_md is not None and self._by_md_changes != Record._birthday_changes:
+            self._by_md = None
+        return self._by_md
+
+    def _birthday_index(self) -> Dict[Tuple[int, int], List[Record]]:
+        index = self._live_index()
+        if index is None:
+            index = {}
+            for record in self._records.values():
+                if record is not None and record.birthday is not None:
+                    bday: date = record.birthday.value
+                    index.setdefault((bday.month, bday.day), []).append(record)
+            self._by_md = index
+            self._by_md_changes = Record._birthday_changes
+        return index
+
+    def _index_birthday(self, record: Record) -> None:
+        index = self._live_index()
+        if index is None or record is None or record.birthday is None:
+            return
+        bday: date = record.birthday.value
+        index.setdefault((bday.month, bday.day), []).append(record)
+
+    def _unindex_birthday(self, record: Record) -> None:
+        index = self._live_index()
+        if index is None or record is None or record.birthday is None:
+            return
+        bday: date = record.birthday.value
+        key = (bday.month, bday.day)
+        bucket = index.get(key, [])
+        for i, r in enumerate(bucket):
+            if r is record:
+                del bucket[i]
+                break
+        if not bucket:
+            index.pop(key, None)
+
     def add_record(self, record: Record) -> None:
-        self.data[record.name.value] = record
+        self[record.name.value] = record
 
     def find(self, name: str) -> Optional[Record]:
-        return self.data.get(name)
+        return self._records.get(name)
 
     def delete(self, name: str) -> bool:
-        if name in self.data:
-            del self.data[name]
+        if name in self._records:
+            del self[name]
             return True
         return False
 
+    def to_plain(self) -> Dict[str, dict]:
+        return {
+            name: {
+                "phones": [p.value for p in record.phones],
+                "birthday": _plain_date(record.birthday.value) if record.birthday else None,
+            }
+            for name, record in self._records.items()
+        }
+
+    @classmethod
+    def from_plain(cls, plain: Dict[str, dict]) -> AddressBook:
+        book = cls()
+        for name, fields in plain.items():
+            record = Record(name)
+            record.add_phones(fields.get("phones", ()))
+            if fields.get("birthday"):
+                record.add_birthday(fields["birthday"])
+            book.add_record(record)
+        return book
+
     def get_upcoming_birthdays(self) -> List[dict]:
-        today = date.today()
-        end_date = today + timedelta(days=7)
+        today_ord = date.today().toordinal()
+        by_md = self._birthday_index()
         upcoming: List[dict] = []
 
-        for record in self.data.values():
-            if record.birthday is None:
+        # Only the 8 calendar days from today to today + 7 can match, so look
+        # those up in the (month, day) index instead of scanning every record.
+        for ordinal in range(today_ord, today_ord + 8):
+            candidate = date.fromordinal(ordinal)
+            month, day = candidate.month, candidate.day
+            records = by_md.get((month, day), ())
+            if month == 2 and day == 28 and not isleap(candidate.year):
+                # Feb 29 birthdays are celebrated on Feb 28 in non-leap years.
+                records = [*records, *by_md.get((2, 29), ())]
+            if not records:
                 continue
-            bday: date = record.birthday.value
-
-            year = today.year
-            month, day = bday.month, bday.day
-            try:
-                bday_this_year = date(year, month, day)
-            except ValueError:
-                if month == 2 and day == 29:
-                    bday_this_year = date(year, 2, 28)
-                else:
-                    continue
-
-            candidate = bday_this_year if bday_this_year >= today else date(year + 1, month, day if not (month == 2 and day == 29) else 28)
-
-            if today <= candidate <= end_date:
-                congratulation_date = candidate
-                if congratulation_date.weekday() == 5:
-                    congratulation_date += timedelta(days=2)
-                elif congratulation_date.weekday() == 6:
-                    congratulation_date += timedelta(days=1)
 
+            congratulation_date = candidate
+            shift = _WEEKEND_SHIFT[candidate.weekday()]
+            if shift:
+                congratulation_date = date.fromordinal(ordinal + shift)
+            congratulation = congratulation_date.isoformat()
+
+            for record in records:
                 upcoming.append({
                     "name": record.name.value,
-                    "congratulation_date": congratulation_date.strftime("%Y-%m-%d"),
+                    "congratulation_date": congratulation,
                 })
 
-        upcoming.sort(key=lambda x: (x["congratulation_date"], x["name"]))
+        upcoming.sort(key=itemgetter("congratulation_date", "name"))
         return upcoming
 
 
+_IO_BUFFER_SIZE = 1 << 20
+
+
 def save_data(book, filename: str = "addressbook.pkl"):
-    with open(filename, "wb") as f:
-        pickle.dump(book, f)
+    # Write to a temporary file and swap it in, so a crash mid-write
+    # cannot leave a truncated address book behind.
+    tmp = filename + ".tmp"
+    try:
+        with open(tmp, "wb", buffering=_IO_BUFFER_SIZE) as f:
+            if filename.endswith(".json"):
+                f.write(json.dumps(book.to_plain(), ensure_ascii=False).encode("utf-8"))
+            else:
+                pickle.dump(book, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        # Keep the permissions of the file being replaced.
+        with suppress(FileNotFoundError):
+            shutil.copymode(filename, tmp)
+        os.replace(tmp, filename)
+    except BaseException:
+        with suppress(OSError):
+            os.unlink(tmp)
+        raise
 
 
 def load_data(filename: str = "addressbook.pkl") -> "AddressBook":
     try:
-        with open(filename, "rb") as f:
+        with open(filename, "rb", buffering=_IO_BUFFER_SIZE) as f:
+            if filename.endswith(".json"):
+                return AddressBook.from_plain(json.load(f))
             return pickle.load(f)
     except FileNotFoundError:
         return AddressBook()
@@ -169,11 +451,12 @@ def input_error(func):
 
 
 def parse_input(user_input: str):
-    parts = user_input.strip().split()
+    parts = user_input.split(None, 1)
     if not parts:
         return "", []
-    command = parts[0].lower()
-    return command, parts[1:]
+    command = sys.intern(parts[0].lower())
+    args = parts[1].split() if len(parts) > 1 else []
+    return command, args
 
 
 @input_error
@@ -214,12 +497,12 @@ def show_phones(args, book: AddressBook):
 
 @input_error
 def show_all(args, book: AddressBook):
-    if not book.data:
+    if not book:
         return "No contacts found."
     lines = []
-    for record in book.data.values():
-        phones = "; ".join(p.value for p in record.phones) if record.phones else "no phones"
-        bday = record.birthday.value.strftime("%d.%m.%Y") if record.birthday else "N/A"
+    for record in book.values():
+        phones = record.phones_str() if record.phones else "no phones"
+        bday = record.birthday.display_dmy if record.birthday else "N/A"
         lines.append(f"{record.name.value}: {phones}; birthday: {bday}")
     return "\n".join(lines)
 
@@ -242,7 +525,7 @@ def show_birthday(args, book: AddressBook):
         return "Contact not found."
     if record.birthday is None:
         return "Birthday not set."
-    return record.birthday.value.strftime("%d.%m.%Y")
+    return record.birthday.display_dmy
 
 
 @input_error
@@ -250,15 +533,32 @@ def birthdays(args, book: AddressBook):
     upcoming = book.get_upcoming_birthdays()
     if not upcoming:
         return "No birthdays in the next week."
-    grouped = {}
-    for item in upcoming:
-        grouped.setdefault(item["congratulation_date"], []).append(item["name"])
-    lines = []
-    for day in sorted(grouped.keys()):
-        lines.append(f"{day}: {', '.join(sorted(grouped[day]))}")
+    # upcoming is sorted by (date, name), so each date is one contiguous run.
+    lines = [
+        f"{day}: {', '.join(item['name'] for item in items)}"
+        for day, items in groupby(upcoming, key=itemgetter("congratulation_date"))
+    ]
     return "\n".join(lines)
 
 
+def hello(args, book: AddressBook):
+    return "How can I help you?"
+
+
+COMMANDS = {
+    "hello": hello,
+    "add": add_contact,
+    "change": change_phone,
+    "phone": show_phones,
+    "all": show_all,
+    "add-birthday": add_birthday,
+    "show-birthday": show_birthday,
+    "birthdays": birthdays,
+}
+
+_EXIT_CMDS = frozenset(("close", "exit"))
+
+
 def main():
     book = load_data()
     print("Welcome to the assistant bot!")
@@ -266,28 +566,15 @@ def main():
         user_input = input("Enter a command: ")
         command, args = parse_input(user_input)
 
-        if command in ["close", "exit"]:
+        if command in _EXIT_CMDS:
             save_data(book)
             print("Good bye!")
             break
-        elif command == "hello":
-            print("How can I help you?")
-        elif command == "add":
-            print(add_contact(args, book))
-        elif command == "change":
-            print(change_phone(args, book))
-        elif command == "phone":
-            print(show_phones(args, book))
-        elif command == "all":
-            print(show_all(args, book))
-        elif command == "add-birthday":
-            print(add_birthday(args, book))
-        elif command == "show-birthday":
-            print(show_birthday(args, book))
-        elif command == "birthdays":
-            print(birthdays(args, book))
-        else:
+        handler = COMMANDS.get(command)
+        if handler is None:
             print("Invalid command.")
+        else:
+            print(handler(args, book))
 
 
 if __name__ == "__main__":